@@ -2,15 +2,32 @@
 WhatsApp Flows Encryption/Decryption Module
 """
 
-import base64
-import json
 import logging
+from functools import lru_cache
+import orjson
 from cryptography.hazmat.primitives import serialization, hashes
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# pybase64 dispatches to SIMD (AVX2/SSSE3/NEON) codecs; fall back to the stdlib
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
 
 logger = logging.getLogger(__name__)
 
+# WhatsApp sends a 16-byte initial vector; the response uses its bitwise inverse
+IV_LENGTH = 16
+IV_XOR_MASK = (1 << (IV_LENGTH * 8)) - 1
+
+# OAEP parameters used by WhatsApp to wrap the AES key; built once and reused
+OAEP_PADDING = padding.OAEP(
+    mgf=padding.MGF1(algorithm=hashes.SHA256()),
+    algorithm=hashes.SHA256(),
+    label=None
+)
+
 
 class FlowEndpointException(Exception):
     """Custom exception for Flow endpoint errors"""
@@ -19,41 +36,57 @@ class FlowEndpointException(Exception):
         self.status_code = status_code
 
 
-def decrypt_request(body: dict, private_pem: str, passphrase: str = "") -> dict:
+@lru_cache(maxsize=1024)
+def _aesgcm(aes_key: bytes) -> AESGCM:
+    """Return an AESGCM cipher for the key, reused across decrypt/encrypt"""
+    return AESGCM(aes_key)
+
+
+@lru_cache(maxsize=8)
+def load_private_key(private_pem: str, passphrase: str = "") -> rsa.RSAPrivateKey:
     """
-    Decrypt WhatsApp Flow request
+    Load the RSA private key used to decrypt Flow requests
+    
+    Parsing the PEM (and deriving the key from the passphrase) is expensive,
+    so the result is cached per (private_pem, passphrase) pair.
     
     Args:
-        body: Request body containing encrypted data
         private_pem: Private key in PEM format
         passphrase: Passphrase for private key (optional)
     
     Returns:
-        Dict with decrypted_body, aes_key, and initial_vector
+        Loaded RSA private key
     """
-    encrypted_aes_key = body.get("encrypted_aes_key")
-    encrypted_flow_data = body.get("encrypted_flow_data")
-    initial_vector = body.get("initial_vector")
-    
-    # Load private key
     passphrase_bytes = passphrase.encode('utf-8') if passphrase else None
-    private_key = serialization.load_pem_private_key(
+    return serialization.load_pem_private_key(
         private_pem.encode('utf-8'),
         password=passphrase_bytes
     )
+
+
+def decrypt_request(body: dict, private_key: rsa.RSAPrivateKey) -> dict:
+    """
+    Decrypt WhatsApp Flow request
+    
+    Args:
+        body: Request body containing encrypted data
+        private_key: RSA private key, see load_private_key()
+    
+    Returns:
+        Dict with decrypted_body, aes_key, and initial_vector
+    """
+    encrypted_aes_key = body.get("encrypted_aes_key")
+    encrypted_flow_data = body.get("encrypted_flow_data")
+    initial_vector = body.get("initial_vector")
     
     # Decrypt AES key
     try:
         decrypted_aes_key = private_key.decrypt(
             base64.b64decode(encrypted_aes_key),
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
+            OAEP_PADDING
         )
     except Exception as error:
-        logger.error(f"Decryption error: {error}")
+        logger.error("Decryption error: %s", error)
         raise FlowEndpointException(
             421,
             "Failed to decrypt the request. Please verify your private key."
@@ -62,29 +95,28 @@ def decrypt_request(body: dict, private_pem: str, passphrase: str = "") -> dict:
     # Decrypt flow data
     flow_data_buffer = base64.b64decode(encrypted_flow_data)
     initial_vector_buffer = base64.b64decode(initial_vector)
+    if len(initial_vector_buffer) != IV_LENGTH:
+        raise FlowEndpointException(
+            400,
+            f"Invalid initial vector: expected {IV_LENGTH} bytes, "
+            f"got {len(initial_vector_buffer)}"
+        )
     
-    TAG_LENGTH = 16
-    encrypted_flow_data_body = flow_data_buffer[:-TAG_LENGTH]
-    encrypted_flow_data_tag = flow_data_buffer[-TAG_LENGTH:]
-    
-    # Decrypt using AES-128-GCM
-    cipher = Cipher(
-        algorithms.AES(decrypted_aes_key),
-        modes.GCM(initial_vector_buffer, encrypted_flow_data_tag)
+    # Decrypt using AES-128-GCM (the buffer ends with the 16-byte auth tag)
+    decrypted_data = _aesgcm(decrypted_aes_key).decrypt(
+        initial_vector_buffer,
+        flow_data_buffer,
+        None
     )
-    decryptor = cipher.decryptor()
-    
-    decrypted_data = decryptor.update(encrypted_flow_data_body) + decryptor.finalize()
-    decrypted_json_string = decrypted_data.decode('utf-8')
     
     return {
-        "decrypted_body": json.loads(decrypted_json_string),
+        "decrypted_body": orjson.loads(decrypted_data),
         "aes_key": decrypted_aes_key,
         "initial_vector": initial_vector_buffer
     }
 
 
-def encrypt_response(response: dict, aes_key: bytes, initial_vector: bytes) -> str:
+def encrypt_response(response: dict, aes_key: bytes, initial_vector: bytes) -> bytes:
     """
     Encrypt response for WhatsApp Flow
     
@@ -94,22 +126,28 @@ def encrypt_response(response: dict, aes_key: bytes, initial_vector: bytes) -> s
         initial_vector: Initial vector from decrypted request
     
     Returns:
-        Base64 encoded encrypted response
+        Base64 encoded encrypted response (ASCII bytes)
     """
-    # Flip initial vector
-    flipped_iv = bytes(~b & 0xFF for b in initial_vector)
-    
-    # Encrypt response data using AES-128-GCM
-    cipher = Cipher(
-        algorithms.AES(aes_key),
-        modes.GCM(flipped_iv)
-    )
-    encryptor = cipher.encryptor()
+    return encrypt_response_bytes(orjson.dumps(response), aes_key, initial_vector)
+
+
+def encrypt_response_bytes(response_json: bytes, aes_key: bytes, initial_vector: bytes) -> bytes:
+    """
+    Encrypt an already serialized JSON response for WhatsApp Flow
     
-    response_json = json.dumps(response)
-    encrypted_data = encryptor.update(response_json.encode('utf-8')) + encryptor.finalize()
+    Args:
+        response_json: UTF-8 encoded JSON response body
+        aes_key: AES key from decrypted request
+        initial_vector: Initial vector from decrypted request
     
-    # Combine encrypted data and auth tag
-    encrypted_data_with_tag = encrypted_data + encryptor.tag
+    Returns:
+        Base64 encoded encrypted response (ASCII bytes)
+    """
+    # Flip initial vector (XOR every bit as one integer instead of per byte);
+    # decrypt_request() has already checked it is IV_LENGTH bytes
+    flipped_iv = (
+        int.from_bytes(initial_vector, 'big') ^ IV_XOR_MASK
+    ).to_bytes(IV_LENGTH, 'big')
     
-    return base64.b64encode(encrypted_data_with_tag).decode('utf-8')
+    # Encrypt response data using AES-128-GCM (auth tag is appended)
+    return base64.b64encode(_aesgcm(aes_key).encrypt(flipped_iv, response_json, None))
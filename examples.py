@@ -5,14 +5,14 @@ Demonstrates how to send different types of messages
 
 import os
 from dotenv import load_dotenv
-from whatsapp_api import WhatsAppCloudAPI, WhatsAppFlowsAPI
+from whatsapp_api import get_cloud_api, get_flows_api
 
 load_dotenv()
 
 
 def example_send_text_message():
     """Example: Send a simple text message"""
-    api = WhatsAppCloudAPI()
+    api = get_cloud_api()
     
     recipient = "1234567890"  # Replace with actual number (without +)
     message = "Hello! This is a test message from your chatbot."
@@ -23,7 +23,7 @@ def example_send_text_message():
 
 def example_send_text_with_url_preview():
     """Example: Send text message with URL preview"""
-    api = WhatsAppCloudAPI()
+    api = get_cloud_api()
     
     recipient = "1234567890"
     message = "Check out our website: https://example.com"
@@ -34,7 +34,7 @@ def example_send_text_with_url_preview():
 
 def example_send_flow_message():
     """Example: Send a Flow message to start interactive flow"""
-    api = WhatsAppCloudAPI()
+    api = get_cloud_api()
     
     recipient = "1234567890"
     flow_id = os.getenv("WHATSAPP_FLOW_ID")
@@ -56,7 +56,7 @@ def example_send_flow_message():
 
 def example_send_template_message():
     """Example: Send a template message"""
-    api = WhatsAppCloudAPI()
+    api = get_cloud_api()
     
     recipient = "1234567890"
     template_name = "hello_world"  # Replace with your template name
@@ -71,7 +71,7 @@ def example_send_template_message():
 
 def example_send_template_with_parameters():
     """Example: Send template with dynamic parameters"""
-    api = WhatsAppCloudAPI()
+    api = get_cloud_api()
     
     recipient = "1234567890"
     
@@ -97,7 +97,7 @@ def example_send_template_with_parameters():
 
 def example_create_flow():
     """Example: Create a new Flow"""
-    flows_api = WhatsAppFlowsAPI()
+    flows_api = get_flows_api()
     
     response = flows_api.create_flow(
         name="Customer Registration Flow",
@@ -112,7 +112,7 @@ def example_create_flow():
 
 def example_upload_flow_json():
     """Example: Upload Flow JSON configuration"""
-    flows_api = WhatsAppFlowsAPI()
+    flows_api = get_flows_api()
     
     flow_id = "YOUR_FLOW_ID"  # Replace with actual Flow ID
     flow_json_path = "flow.json"  # Path to your flow.json file
@@ -123,7 +123,7 @@ def example_upload_flow_json():
 
 def example_publish_flow():
     """Example: Publish a Flow"""
-    flows_api = WhatsAppFlowsAPI()
+    flows_api = get_flows_api()
     
     flow_id = "YOUR_FLOW_ID"
     
@@ -133,7 +133,7 @@ def example_publish_flow():
 
 def example_get_flow_details():
     """Example: Get Flow details"""
-    flows_api = WhatsAppFlowsAPI()
+    flows_api = get_flows_api()
     
     flow_id = "YOUR_FLOW_ID"
     
@@ -146,7 +146,7 @@ def example_get_flow_details():
 
 def example_complete_flow_setup():
     """Example: Complete flow setup from scratch"""
-    flows_api = WhatsAppFlowsAPI()
+    flows_api = get_flows_api()
     
     # Step 1: Create Flow
     print("Creating flow...")
@@ -177,7 +177,7 @@ def example_complete_flow_setup():
 
 def example_mark_message_as_read():
     """Example: Mark a message as read"""
-    api = WhatsAppCloudAPI()
+    api = get_cloud_api()
     
     message_id = "wamid.XXXXX"  # Message ID from webhook
     
@@ -5,13 +5,22 @@ This module handles the flow state management and screen navigation.
 Customize the screens and logic based on your specific flow requirements.
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Union
 import logging
+import re
+import orjson
 
 logger = logging.getLogger(__name__)
 
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# Simple validation - adjust based on your requirements
+PHONE_PATTERN = re.compile(r'^\+?[1-9]\d{1,14}$')
 
-async def get_next_screen(decrypted_body: Dict[str, Any]) -> Dict[str, Any]:
+# Pre-serialized ping response; only the (JSON-encoded) version is spliced in
+_PING_RESPONSE_TEMPLATE = b'{"version":%s,"data":{"status":"active"}}'
+
+
+def get_next_screen(decrypted_body: Dict[str, Any]) -> Union[Dict[str, Any], bytes]:
     """
     Process flow request and return appropriate screen response
     
@@ -19,49 +28,16 @@ async def get_next_screen(decrypted_body: Dict[str, Any]) -> Dict[str, Any]:
         decrypted_body: Decrypted request body from WhatsApp
         
     Returns:
-        Screen response to be encrypted and sent back
+        Screen response to be encrypted and sent back, either as a dict or
+        as already serialized JSON bytes (see encrypt_response_bytes)
     """
     action = decrypted_body.get("action")
-    screen = decrypted_body.get("screen")
-    data = decrypted_body.get("data", {})
-    flow_token = decrypted_body.get("flow_token")
     
-    logger.info(f"Processing action: {action}, screen: {screen}")
+    logger.info("Processing action: %s, screen: %s", action, decrypted_body.get("screen"))
     
     # Handle different actions
-    if action == "ping":
-        # Health check from WhatsApp
-        return {
-            "version": decrypted_body.get("version", "3.0"),
-            "data": {
-                "status": "active"
-            }
-        }
-    
-    elif action == "INIT":
-        # Initialize flow - return first screen
-        return {
-            "version": decrypted_body.get("version", "3.0"),
-            "screen": "WELCOME",
-            "data": {
-                "welcome_message": "Welcome to our service!",
-                "flow_token": flow_token
-            }
-        }
-    
-    elif action == "data_exchange":
-        # Handle data exchange between screens
-        return handle_data_exchange(screen, data, flow_token, decrypted_body)
-    
-    else:
-        # Unknown action
-        logger.warning(f"Unknown action received: {action}")
-        return {
-            "version": decrypted_body.get("version", "3.0"),
-            "data": {
-                "error": f"Unknown action: {action}"
-            }
-        }
+    handler = _ACTION_HANDLERS.get(action, _handle_unknown_action)
+    return handler(decrypted_body)
 
 
 def handle_data_exchange(
@@ -84,80 +60,137 @@ def handle_data_exchange(
     """
     version = decrypted_body.get("version", "3.0")
     
-    # Example: Handle different screens
-    if screen == "WELCOME":
-        # User submitted data from welcome screen
-        return {
-            "version": version,
-            "screen": "DETAILS",
-            "data": {
-                "user_name": data.get("name", "User"),
-                "message": "Please provide more details"
-            }
-        }
+    handler = _SCREEN_HANDLERS.get(screen)
+    if handler is not None:
+        return handler(data, flow_token, version)
     
-    elif screen == "DETAILS":
-        # User submitted details
-        # You can save this data to database here
-        user_details = {
-            "name": data.get("name"),
-            "email": data.get("email"),
-            "phone": data.get("phone")
+    # Unknown screen
+    logger.warning("Unknown screen received: %s", screen)
+    return {
+        "version": version,
+        "data": {
+            "error": f"Unknown screen: {screen}"
         }
-        
-        logger.info(f"User details submitted for flow_token: {flow_token}")
-        
-        # Return success screen
-        return {
-            "version": version,
-            "screen": "SUCCESS",
-            "data": {
-                "success": True,
-                "message": f"Thank you, {user_details['name']}!",
-                "confirmation_id": flow_token
-            }
+    }
+
+
+# Action handlers
+
+def _handle_ping(decrypted_body: Dict[str, Any]) -> bytes:
+    """Health check from WhatsApp"""
+    return _PING_RESPONSE_TEMPLATE % orjson.dumps(decrypted_body.get("version", "3.0"))
+
+
+def _handle_init(decrypted_body: Dict[str, Any]) -> Dict[str, Any]:
+    """Initialize flow - return first screen"""
+    return {
+        "version": decrypted_body.get("version", "3.0"),
+        "screen": "WELCOME",
+        "data": {
+            "welcome_message": "Welcome to our service!",
+            "flow_token": decrypted_body.get("flow_token")
         }
-    
-    elif screen == "SUCCESS":
-        # Flow completion
-        return {
-            "version": version,
-            "data": {
-                "extension_message_response": {
-                    "params": {
-                        "flow_token": flow_token,
-                        "some_param_name": "some_param_value"
-                    }
-                }
-            }
+    }
+
+
+def _handle_data_exchange(decrypted_body: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle data exchange between screens"""
+    return handle_data_exchange(
+        decrypted_body.get("screen"),
+        decrypted_body.get("data", {}),
+        decrypted_body.get("flow_token"),
+        decrypted_body
+    )
+
+
+def _handle_unknown_action(decrypted_body: Dict[str, Any]) -> Dict[str, Any]:
+    """Unknown action"""
+    action = decrypted_body.get("action")
+    logger.warning("Unknown action received: %s", action)
+    return {
+        "version": decrypted_body.get("version", "3.0"),
+        "data": {
+            "error": f"Unknown action: {action}"
+        }
+    }
+
+
+# Screen handlers
+
+def _handle_welcome_screen(data: Dict[str, Any], flow_token: str, version: str) -> Dict[str, Any]:
+    """User submitted data from welcome screen"""
+    return {
+        "version": version,
+        "screen": "DETAILS",
+        "data": {
+            "user_name": data.get("name", "User"),
+            "message": "Please provide more details"
         }
+    }
+
+
+def _handle_details_screen(data: Dict[str, Any], flow_token: str, version: str) -> Dict[str, Any]:
+    """User submitted details"""
+    # You can save this data to database here
+    user_details = {
+        "name": data.get("name"),
+        "email": data.get("email"),
+        "phone": data.get("phone")
+    }
+    
+    logger.info("User details submitted for flow_token: %s", flow_token)
     
-    else:
-        # Unknown screen
-        logger.warning(f"Unknown screen received: {screen}")
-        return {
-            "version": version,
-            "data": {
-                "error": f"Unknown screen: {screen}"
+    # Return success screen
+    return {
+        "version": version,
+        "screen": "SUCCESS",
+        "data": {
+            "success": True,
+            "message": f"Thank you, {user_details['name']}!",
+            "confirmation_id": flow_token
+        }
+    }
+
+
+def _handle_success_screen(data: Dict[str, Any], flow_token: str, version: str) -> Dict[str, Any]:
+    """Flow completion"""
+    return {
+        "version": version,
+        "data": {
+            "extension_message_response": {
+                "params": {
+                    "flow_token": flow_token,
+                    "some_param_name": "some_param_value"
+                }
             }
         }
+    }
+
+
+# Dispatch tables - register new actions/screens here
+_ACTION_HANDLERS = {
+    "ping": _handle_ping,
+    "INIT": _handle_init,
+    "data_exchange": _handle_data_exchange,
+}
+
+_SCREEN_HANDLERS = {
+    "WELCOME": _handle_welcome_screen,
+    "DETAILS": _handle_details_screen,
+    "SUCCESS": _handle_success_screen,
+}
 
 
 # Additional helper functions for your business logic
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    import re
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_PATTERN.match(email) is not None
 
 
 def validate_phone(phone: str) -> bool:
     """Validate phone number format"""
-    import re
-    # Simple validation - adjust based on your requirements
-    pattern = r'^\+?[1-9]\d{1,14}$'
-    return re.match(pattern, phone) is not None
+    return PHONE_PATTERN.match(phone) is not None
 
 
 async def save_flow_data(flow_token: str, data: Dict[str, Any]) -> bool:
@@ -3,13 +3,21 @@ WhatsApp Flows FastAPI Server
 """
 
 import os
+import asyncio
 import hmac
 import hashlib
 import logging
+import orjson
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, Response
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 from dotenv import load_dotenv
-from encryption import decrypt_request, encrypt_response, FlowEndpointException
+from encryption import (
+    decrypt_request,
+    encrypt_response,
+    encrypt_response_bytes,
+    load_private_key,
+    FlowEndpointException,
+)
 from flow import get_next_screen
 
 load_dotenv()
@@ -21,47 +29,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="WhatsApp Flows Endpoint")
+app = FastAPI(
+    title="WhatsApp Flows Endpoint",
+    default_response_class=ORJSONResponse
+)
 
 APP_SECRET = os.getenv("APP_SECRET")
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")
 PASSPHRASE = os.getenv("PASSPHRASE", "")
 PORT = int(os.getenv("PORT", "3000"))
+WORKERS = int(os.getenv("WORKERS", os.cpu_count() or 1))
+ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+
+# Parse the private key once at startup instead of on every request
+PRIVATE_KEY_OBJ = load_private_key(PRIVATE_KEY, PASSPHRASE) if PRIVATE_KEY else None
+
+# Keyed HMAC state, copied per request so the key schedule is only computed once
+HMAC_TEMPLATE = (
+    hmac.new(APP_SECRET.encode('utf-8'), digestmod=hashlib.sha256)
+    if APP_SECRET else None
+)
 
 
 def is_request_signature_valid(signature_header: str, raw_body: bytes) -> bool:
     """Validate request signature using HMAC SHA256"""
-    if not APP_SECRET:
-        logger.critical("CRITICAL: App Secret is not set. Rejecting request for security.")
-        logger.warning("Set APP_SECRET in .env file to accept requests.")
-        return False
-    
     if not signature_header:
         return False
     
     signature = signature_header.replace("sha256=", "")
     
     # Calculate expected signature
-    hmac_obj = hmac.new(
-        APP_SECRET.encode('utf-8'),
-        raw_body,
-        hashlib.sha256
-    )
-    expected_signature = hmac_obj.hexdigest()
+    hmac_obj = HMAC_TEMPLATE.copy()
+    hmac_obj.update(raw_body)
+    expected_digest = hmac_obj.digest()
+    
+    try:
+        signature_digest = bytes.fromhex(signature)
+    except ValueError:
+        logger.error("Request Signature is not valid hex")
+        return False
     
     # Constant time comparison
-    if not hmac.compare_digest(expected_signature, signature):
+    if not hmac.compare_digest(expected_digest, signature_digest):
         logger.error("Request Signature did not match")
         return False
     
     return True
 
 
+def reject_request_signature(signature_header: str, raw_body: bytes) -> bool:
+    """Reject every request; used when APP_SECRET is not configured"""
+    return False
+
+
+# Check the App Secret once at startup instead of on every request
+if not APP_SECRET:
+    if ENVIRONMENT == "production":
+        raise RuntimeError("APP_SECRET is not set. Refusing to start in production.")
+    logger.critical("CRITICAL: App Secret is not set. All flow requests will be rejected for security.")
+    logger.warning("Set APP_SECRET in .env file to accept requests.")
+    is_request_signature_valid = reject_request_signature
+
+
 @app.post("/")
 async def handle_flow_request(request: Request):
     """Main endpoint for WhatsApp Flows"""
     
-    if not PRIVATE_KEY:
+    if PRIVATE_KEY_OBJ is None:
         raise HTTPException(
             status_code=500,
             detail='Private key is empty. Please check your env variable "PRIVATE_KEY".'
@@ -75,25 +109,29 @@ async def handle_flow_request(request: Request):
     if not is_request_signature_valid(signature_header, raw_body):
         return Response(status_code=432)
     
-    # Parse JSON body
-    body = await request.json()
+    # Parse JSON body from the bytes already read for the signature check
+    body = orjson.loads(raw_body)
     
-    # Decrypt request
+    # Decrypt request (RSA is CPU-bound, keep it off the event loop)
     try:
-        decrypted_request = decrypt_request(body, PRIVATE_KEY, PASSPHRASE)
+        decrypted_request = await asyncio.to_thread(decrypt_request, body, PRIVATE_KEY_OBJ)
     except FlowEndpointException as e:
-        logger.error(f"FlowEndpointException: {e}")
+        logger.error("FlowEndpointException: %s", e)
         return Response(status_code=e.status_code)
     except Exception as e:
-        logger.error(f"Error decrypting request: {e}")
+        logger.error("Error decrypting request: %s", e)
         return Response(status_code=500)
     
     aes_key = decrypted_request["aes_key"]
     initial_vector = decrypted_request["initial_vector"]
     decrypted_body = decrypted_request["decrypted_body"]
     
-    logger.info(f"Decrypted Request - Action: {decrypted_body.get('action')}, Screen: {decrypted_body.get('screen')}")
-    logger.debug(f"Full decrypted body: {decrypted_body}")
+    logger.info(
+        "Decrypted Request - Action: %s, Screen: %s",
+        decrypted_body.get("action"),
+        decrypted_body.get("screen")
+    )
+    logger.debug("Full decrypted body: %s", decrypted_body)
     
     # Optional: Validate flow token
     # if not is_valid_flow_token(decrypted_body.get("flow_token")):
@@ -102,13 +140,16 @@ async def handle_flow_request(request: Request):
     #     return Response(content=encrypted_response, status_code=427)
     
     # Get screen response
-    screen_response = await get_next_screen(decrypted_body)
-    logger.info(f"Screen response prepared for action: {decrypted_body.get('action')}")
-    logger.debug(f"Response to encrypt: {screen_response}")
+    screen_response = get_next_screen(decrypted_body)
+    logger.info("Screen response prepared for action: %s", decrypted_body.get("action"))
+    logger.debug("Response to encrypt: %s", screen_response)
     
     # Encrypt and return response
-    encrypted_response = encrypt_response(screen_response, aes_key, initial_vector)
-    return Response(content=encrypted_response)
+    if isinstance(screen_response, bytes):
+        encrypted_response = encrypt_response_bytes(screen_response, aes_key, initial_vector)
+    else:
+        encrypted_response = encrypt_response(screen_response, aes_key, initial_vector)
+    return Response(content=encrypted_response, media_type="text/plain")
 
 
 @app.get("/webhook")
@@ -138,7 +179,7 @@ async def handle_webhook(request: Request):
     This is different from the Flow endpoint (/)
     """
     body = await request.json()
-    logger.info(f"Webhook received: {body}")
+    logger.info("Webhook received: %s", body)
     
     # Process webhook events (messages, status updates, etc.)
     # Extract message data from webhook
@@ -150,7 +191,11 @@ async def handle_webhook(request: Request):
         
         if messages:
             for message in messages:
-                logger.info(f"New message from {message.get('from')}: {message.get('text', {}).get('body', 'N/A')}")
+                logger.info(
+                    "New message from %s: %s",
+                    message.get("from"),
+                    message.get("text", {}).get("body", "N/A")
+                )
                 # TODO: Process incoming messages
                 # You can use whatsapp_api.py to reply
         
@@ -158,7 +203,7 @@ async def handle_webhook(request: Request):
         return {"status": "ok"}
     
     except Exception as e:
-        logger.error(f"Error processing webhook: {e}")
+        logger.error("Error processing webhook: %s", e)
         return {"status": "error", "message": str(e)}
 
 
@@ -177,4 +222,13 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=PORT)
+    # Multiple workers require the app as an import string. The event loop and
+    # HTTP parser are left on "auto", which picks uvloop/httptools when they are
+    # installed and falls back to asyncio/h11 (e.g. on Windows).
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=PORT,
+        workers=WORKERS,
+        log_level="warning"
+    )
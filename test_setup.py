@@ -6,11 +6,53 @@ Run this to verify your setup is working correctly.
 
 import os
 import sys
+import functools
+from importlib.metadata import distribution, PackageNotFoundError
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Variables whose names contain any of these are never printed
+MASKED_MARKERS = ("KEY", "SECRET", "PASS", "TOKEN")
 
+
+# Import names whose installed distribution is named differently
+PACKAGE_TO_DIST = {"dotenv": "python-dotenv"}
+
+# Output is queued and written in one go rather than one print() per line
+_output_lines = []
+
+
+def emit(line: str):
+    """Queue a line of output"""
+    _output_lines.append(line)
+
+
+def flush_output():
+    """Write all queued output with a single write"""
+    if _output_lines:
+        sys.stdout.write("\n".join(_output_lines) + "\n")
+        sys.stdout.flush()
+        _output_lines.clear()
+
+
+def buffered_output(func):
+    """Flush queued output once the decorated step finishes"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            flush_output()
+    return wrapper
+
+
+def is_masked(var: str) -> bool:
+    """Whether the value of an environment variable should be hidden"""
+    return any(marker in var for marker in MASKED_MARKERS)
+
+
+@buffered_output
 def check_environment_variables():
     """Check if all required environment variables are set"""
     required_vars = [
@@ -27,74 +69,76 @@ def check_environment_variables():
         "WHATSAPP_FLOW_ID"
     ]
     
-    print("=" * 60)
-    print("🔍 Checking Environment Variables")
-    print("=" * 60)
+    emit("=" * 60)
+    emit("🔍 Checking Environment Variables")
+    emit("=" * 60)
     
     all_set = True
+    env = dict(os.environ)
     
-    print("\n📋 Required Variables (for Flow Endpoint Server):")
+    emit("\n📋 Required Variables (for Flow Endpoint Server):")
     for var in required_vars:
-        value = os.getenv(var)
+        value = env.get(var)
         if value:
-            display_value = "***" if "KEY" in var or "SECRET" in var or "PASS" in var else value[:20] + "..." if len(value) > 20 else value
-            print(f"  ✅ {var}: {display_value}")
+            display_value = "***" if is_masked(var) else value[:20] + "..." if len(value) > 20 else value
+            emit(f"  ✅ {var}: {display_value}")
         else:
-            print(f"  ❌ {var}: NOT SET")
+            emit(f"  ❌ {var}: NOT SET")
             all_set = False
     
-    print("\n📋 Optional Variables (for sending messages):")
+    emit("\n📋 Optional Variables (for sending messages):")
     for var in optional_vars:
-        value = os.getenv(var)
+        value = env.get(var)
         if value:
-            display_value = "***" if "TOKEN" in var else value
-            print(f"  ✅ {var}: {display_value}")
+            display_value = "***" if is_masked(var) else value
+            emit(f"  ✅ {var}: {display_value}")
         else:
-            print(f"  ⚠️  {var}: NOT SET (optional)")
+            emit(f"  ⚠️  {var}: NOT SET (optional)")
     
     return all_set
 
 
+@buffered_output
 def check_dependencies():
     """Check if all required packages are installed"""
-    print("\n" + "=" * 60)
-    print("📦 Checking Python Dependencies")
-    print("=" * 60 + "\n")
+    emit("\n" + "=" * 60)
+    emit("📦 Checking Python Dependencies")
+    emit("=" * 60 + "\n")
     
     packages = [
         "fastapi",
         "uvicorn",
         "cryptography",
+        "orjson",
         "dotenv",
         "pydantic",
-        "requests"
+        "urllib3"
     ]
     
     all_installed = True
     
     for package in packages:
+        # Only reads installed metadata, no package code is executed
         try:
-            if package == "dotenv":
-                __import__("dotenv")
-            else:
-                __import__(package)
-            print(f"  ✅ {package}")
-        except ImportError:
-            print(f"  ❌ {package} - NOT INSTALLED")
+            distribution(PACKAGE_TO_DIST.get(package, package))
+            emit(f"  ✅ {package}")
+        except PackageNotFoundError:
+            emit(f"  ❌ {package} - NOT INSTALLED")
             all_installed = False
     
     if not all_installed:
-        print("\n⚠️  Install missing packages with:")
-        print("   pip install -r requirements.txt")
+        emit("\n⚠️  Install missing packages with:")
+        emit("   pip install -r requirements.txt")
     
     return all_installed
 
 
+@buffered_output
 def check_files():
     """Check if all required files exist"""
-    print("\n" + "=" * 60)
-    print("📁 Checking Required Files")
-    print("=" * 60 + "\n")
+    emit("\n" + "=" * 60)
+    emit("📁 Checking Required Files")
+    emit("=" * 60 + "\n")
     
     required_files = [
         "server.py",
@@ -107,29 +151,33 @@ def check_files():
     ]
     
     all_exist = True
+    # One directory read instead of a stat() per file
+    present = {entry.name for entry in os.scandir(".")}
     
     for file in required_files:
-        if os.path.exists(file):
-            print(f"  ✅ {file}")
+        exists = file in present if os.sep not in file else os.path.exists(file)
+        if exists:
+            emit(f"  ✅ {file}")
         else:
-            print(f"  ❌ {file} - NOT FOUND")
+            emit(f"  ❌ {file} - NOT FOUND")
             all_exist = False
             
             if file == ".env":
-                print("     💡 Copy .env.example to .env and fill in your values")
+                emit("     💡 Copy .env.example to .env and fill in your values")
     
     return all_exist
 
 
+@buffered_output
 def test_encryption():
     """Test encryption/decryption functions"""
-    print("\n" + "=" * 60)
-    print("🔐 Testing Encryption/Decryption")
-    print("=" * 60 + "\n")
+    emit("\n" + "=" * 60)
+    emit("🔐 Testing Encryption/Decryption")
+    emit("=" * 60 + "\n")
     
     try:
         from encryption import encrypt_response, decrypt_request
-        print("  ✅ Encryption module imported successfully")
+        emit("  ✅ Encryption module imported successfully")
         
         # Test data
         test_response = {"test": "data"}
@@ -138,85 +186,87 @@ def test_encryption():
         
         # Test encryption
         encrypted = encrypt_response(test_response, test_aes_key, test_iv)
-        print(f"  ✅ Encryption test passed (output: {encrypted[:20]}...)")
+        emit(f"  ✅ Encryption test passed (output: {encrypted[:20].decode()}...)")
         
         return True
     except Exception as e:
-        print(f"  ❌ Encryption test failed: {e}")
+        emit(f"  ❌ Encryption test failed: {e}")
         return False
 
 
+@buffered_output
 def test_api_client():
     """Test WhatsApp API client"""
-    print("\n" + "=" * 60)
-    print("📡 Testing WhatsApp API Client")
-    print("=" * 60 + "\n")
+    emit("\n" + "=" * 60)
+    emit("📡 Testing WhatsApp API Client")
+    emit("=" * 60 + "\n")
     
     try:
         # Check if access token is set
         if not os.getenv("WHATSAPP_ACCESS_TOKEN"):
-            print("  ⚠️  WHATSAPP_ACCESS_TOKEN not set - skipping API tests")
-            print("     Set it in .env to test API client")
+            emit("  ⚠️  WHATSAPP_ACCESS_TOKEN not set - skipping API tests")
+            emit("     Set it in .env to test API client")
             return True
         
-        from whatsapp_api import WhatsAppCloudAPI, WhatsAppFlowsAPI
+        from whatsapp_api import get_cloud_api, get_flows_api
         
-        print("  ✅ API client modules imported successfully")
+        emit("  ✅ API client modules imported successfully")
         
         # Try to initialize clients
-        api = WhatsAppCloudAPI()
-        print("  ✅ WhatsApp Cloud API client initialized")
+        api = get_cloud_api()
+        emit("  ✅ WhatsApp Cloud API client initialized")
         
         if os.getenv("WHATSAPP_WABA_ID"):
-            flows_api = WhatsAppFlowsAPI()
-            print("  ✅ WhatsApp Flows API client initialized")
+            flows_api = get_flows_api()
+            emit("  ✅ WhatsApp Flows API client initialized")
         else:
-            print("  ⚠️  WHATSAPP_WABA_ID not set - Flows API not tested")
+            emit("  ⚠️  WHATSAPP_WABA_ID not set - Flows API not tested")
         
         return True
     except ValueError as e:
-        print(f"  ⚠️  {e}")
-        print("     This is expected if you haven't set all API credentials yet")
+        emit(f"  ⚠️  {e}")
+        emit("     This is expected if you haven't set all API credentials yet")
         return True
     except Exception as e:
-        print(f"  ❌ API client test failed: {e}")
+        emit(f"  ❌ API client test failed: {e}")
         return False
 
 
+@buffered_output
 def print_next_steps(all_checks_passed):
     """Print next steps based on test results"""
-    print("\n" + "=" * 60)
+    emit("\n" + "=" * 60)
     if all_checks_passed:
-        print("✅ All Checks Passed!")
+        emit("✅ All Checks Passed!")
     else:
-        print("⚠️  Some Checks Failed")
-    print("=" * 60 + "\n")
+        emit("⚠️  Some Checks Failed")
+    emit("=" * 60 + "\n")
     
     if all_checks_passed:
-        print("🚀 You're ready to start the server!\n")
-        print("Run one of these commands:")
-        print("  • python server.py")
-        print("  • uvicorn server:app --reload --port 3000")
-        print("\nThen test with:")
-        print("  • curl http://localhost:3000/health")
-        print("  • Open http://localhost:3000/docs for API documentation")
-        print("\n📖 Read QUICKSTART.md for detailed setup instructions")
+        emit("🚀 You're ready to start the server!\n")
+        emit("Run one of these commands:")
+        emit("  • python server.py")
+        emit("  • uvicorn server:app --reload --port 3000")
+        emit("\nThen test with:")
+        emit("  • curl http://localhost:3000/health")
+        emit("  • Open http://localhost:3000/docs for API documentation")
+        emit("\n📖 Read QUICKSTART.md for detailed setup instructions")
     else:
-        print("⚠️  Please fix the issues above before starting the server\n")
-        print("💡 Quick fixes:")
-        print("  1. Install dependencies: pip install -r requirements.txt")
-        print("  2. Copy .env.example to .env")
-        print("  3. Generate keys: python key_generator.py YourPassphrase")
-        print("  4. Fill in .env with your credentials")
-        print("\n📖 See QUICKSTART.md for step-by-step instructions")
+        emit("⚠️  Please fix the issues above before starting the server\n")
+        emit("💡 Quick fixes:")
+        emit("  1. Install dependencies: pip install -r requirements.txt")
+        emit("  2. Copy .env.example to .env")
+        emit("  3. Generate keys: python key_generator.py YourPassphrase")
+        emit("  4. Fill in .env with your credentials")
+        emit("\n📖 See QUICKSTART.md for step-by-step instructions")
 
 
 def main():
     """Run all tests"""
-    print("\n")
-    print("╔" + "=" * 58 + "╗")
-    print("║" + " " * 10 + "WhatsApp Flows Server - Setup Test" + " " * 13 + "║")
-    print("╚" + "=" * 58 + "╝")
+    emit("\n")
+    emit("╔" + "=" * 58 + "╗")
+    emit("║" + " " * 10 + "WhatsApp Flows Server - Setup Test" + " " * 13 + "║")
+    emit("╚" + "=" * 58 + "╝")
     
     checks = [
         ("Files", check_files()),
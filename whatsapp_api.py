@@ -4,22 +4,269 @@ Send messages and manage flows using WhatsApp Business API
 """
 
 import os
-import requests
-from typing import Dict, Any, Optional
+import re
+import mmap
+import time
+import shutil
+import asyncio
+import threading
+from functools import lru_cache
+from urllib.parse import urlencode
+import orjson
+import urllib3
+from typing import Dict, Any, List, Optional
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
-load_dotenv()
+# httpx is only needed for AsyncWhatsAppCloudAPI
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
+# Retry throttled (429) and transient 5xx responses in the transport layer,
+# honouring Retry-After, with exponential backoff. Once retries run out the
+# last response is returned (not raised) so it surfaces as GraphAPIError.
+# Read errors are never retried: the request may already have been processed,
+# and re-sending a POST would deliver the message twice.
+RETRY_POLICY = Retry(
+    total=5,
+    read=0,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "POST", "DELETE"]),
+    respect_retry_after_header=True,
+    raise_on_status=False
+)
 
-class WhatsAppCloudAPI:
-    """WhatsApp Cloud API Client"""
+# How long get_flow/get_flow_assets/get_media responses are reused
+CACHE_TTL_SECONDS = 60
+
+# Connect quickly, but allow slow Graph API responses
+REQUEST_TIMEOUT = urllib3.Timeout(connect=5, read=30)
+
+_env_loaded = False
+
+
+def _ensure_env_loaded():
+    """Load .env on first client construction rather than at import time"""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+
+class GraphAPIError(Exception):
+    """Error response from the WhatsApp Graph API"""
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _parse_graph_response(status: int, content: bytes) -> Dict:
+    """Decode a JSON response, raising GraphAPIError for error statuses"""
+    if status >= 400:
+        raise GraphAPIError(
+            status,
+            f"Graph API request failed with status {status}: "
+            f"{content.decode('utf-8', 'replace')}"
+        )
+    return orjson.loads(content)
+
+
+def _json_body(data: Optional[Dict]) -> Optional[bytes]:
+    """Serialize a JSON request body with orjson (None means no body)"""
+    return orjson.dumps(data) if data is not None else None
+
+
+def _text_message_payload(to: str, text: str, preview_url: bool) -> Dict[str, Any]:
+    """Build the /messages payload for a text message"""
+    return {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": to,
+        "type": "text",
+        "text": {
+            "preview_url": preview_url,
+            "body": text
+        }
+    }
+
+
+def _flow_message_payload(
+    to: str,
+    flow_id: str,
+    flow_token: str,
+    header_text: str,
+    body_text: str,
+    footer_text: str,
+    cta_text: str,
+    screen: str,
+    flow_action_payload: Optional[Dict]
+) -> Dict[str, Any]:
+    """Build the /messages payload for an interactive Flow message"""
+    action_payload = flow_action_payload or {"screen": screen}
     
-    def __init__(
+    return {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": to,
+        "type": "interactive",
+        "interactive": {
+            "type": "flow",
+            "header": {
+                "type": "text",
+                "text": header_text
+            },
+            "body": {
+                "text": body_text
+            },
+            "footer": {
+                "text": footer_text
+            },
+            "action": {
+                "name": "flow",
+                "parameters": {
+                    "flow_message_version": "3",
+                    "flow_token": flow_token,
+                    "flow_id": flow_id,
+                    "flow_cta": cta_text,
+                    "flow_action": "navigate",
+                    "flow_action_payload": action_payload
+                }
+            }
+        }
+    }
+
+
+def _read_receipt_payload(message_id: str) -> Dict[str, Any]:
+    """Build the /messages payload that marks a message as read"""
+    return {
+        "messaging_product": "whatsapp",
+        "status": "read",
+        "message_id": message_id
+    }
+
+
+# Read receipts only differ by message ID, so the JSON around it is pre-serialized
+_READ_RECEIPT_PREFIX = b'{"messaging_product":"whatsapp","status":"read","message_id":"'
+_READ_RECEIPT_SUFFIX = b'"}'
+# IDs made only of these characters need no JSON escaping
+_PLAIN_MESSAGE_ID = re.compile(r'[A-Za-z0-9_\-=.+/]+')
+
+
+def _read_receipt_body(message_id: str) -> bytes:
+    """Serialized /messages body that marks a message as read"""
+    if _PLAIN_MESSAGE_ID.fullmatch(message_id):
+        return _READ_RECEIPT_PREFIX + message_id.encode('ascii') + _READ_RECEIPT_SUFFIX
+    return orjson.dumps(_read_receipt_payload(message_id))
+
+
+class _TTLCache:
+    """Small in-memory cache for Graph API reads whose entries expire after ttl seconds"""
+    
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: tuple) -> Optional[bytes]:
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+    
+    def set(self, key: tuple, value: bytes):
+        """Cache a value, evicting the oldest entry when full"""
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.maxsize:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+    
+    def invalidate(self, object_id: str):
+        """Drop every cached entry for a Graph API object"""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == object_id]:
+                del self._entries[key]
+
+
+class _GraphAPIClient:
+    """Shared HTTP transport for the Graph API clients"""
+    
+    def _init_http(self):
+        """Create the keep-alive connection pool shared by all calls from this client"""
+        # Built once and passed by reference on every request
+        self._headers_json = {
+            "Authorization": self._auth_header,
+            "Content-Type": "application/json"
+        }
+        self._headers_auth = {"Authorization": self._auth_header}
+        self._http = urllib3.PoolManager(
+            num_pools=2,
+            maxsize=50,
+            timeout=REQUEST_TIMEOUT,
+            retries=RETRY_POLICY
+        )
+        
+        if os.getenv("WHATSAPP_WARMUP") == "1":
+            self._warm_up()
+    
+    def _warm_up(self):
+        """Complete the TLS handshake in the background before the first API call"""
+        def connect():
+            try:
+                self._http.request("HEAD", self.base_url, timeout=5, retries=False)
+            except urllib3.exceptions.HTTPError:
+                pass
+        
+        threading.Thread(target=connect, daemon=True).start()
+    
+    @staticmethod
+    def _parse_response(response: urllib3.BaseHTTPResponse) -> Dict:
+        """Decode a JSON response, raising GraphAPIError for error statuses"""
+        return _parse_graph_response(response.status, response.data)
+    
+    def _cached_get(self, key: tuple, endpoint: str, **kwargs) -> Dict:
+        """GET an endpoint, serving repeated reads from the TTL cache"""
+        # The cache holds serialized JSON and every hit decodes a fresh dict,
+        # so callers can't mutate what later readers get back
+        cached = self._cache.get(key)
+        if cached is not None:
+            return orjson.loads(cached)
+        response = self._make_request("GET", endpoint, **kwargs)
+        self._cache.set(key, orjson.dumps(response))
+        return response
+    
+    def close(self):
+        """Close pooled connections"""
+        self._http.clear()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _CloudAPIConfig:
+    """Credentials and Graph API settings shared by the sync and async Cloud API clients"""
+    
+    def _configure(
         self,
-        access_token: Optional[str] = None,
-        phone_number_id: Optional[str] = None,
-        api_version: str = "v21.0"
+        access_token: Optional[str],
+        phone_number_id: Optional[str],
+        api_version: str
     ):
+        """Resolve settings from arguments or .env and validate them"""
+        _ensure_env_loaded()
+        
         self.access_token = access_token or os.getenv("WHATSAPP_ACCESS_TOKEN")
         self.phone_number_id = phone_number_id or os.getenv("WHATSAPP_PHONE_NUMBER_ID")
         self.api_version = api_version or os.getenv("WHATSAPP_API_VERSION", "v21.0")
@@ -29,6 +276,23 @@ class WhatsAppCloudAPI:
             raise ValueError("Access token is required. Set WHATSAPP_ACCESS_TOKEN in .env")
         if not self.phone_number_id:
             raise ValueError("Phone number ID is required. Set WHATSAPP_PHONE_NUMBER_ID in .env")
+        
+        self._auth_header = f"Bearer {self.access_token}"
+
+
+class WhatsAppCloudAPI(_CloudAPIConfig, _GraphAPIClient):
+    """WhatsApp Cloud API Client"""
+    
+    def __init__(
+        self,
+        access_token: Optional[str] = None,
+        phone_number_id: Optional[str] = None,
+        api_version: str = "v21.0"
+    ):
+        self._configure(access_token, phone_number_id, api_version)
+        self._messages_url = f"{self.base_url}/{self.phone_number_id}/messages"
+        self._init_http()
+        self._cache = _TTLCache()
     
     def _make_request(
         self,
@@ -38,23 +302,28 @@ class WhatsAppCloudAPI:
         params: Optional[Dict] = None
     ) -> Dict:
         """Make HTTP request to WhatsApp API"""
-        url = f"{self.base_url}/{endpoint}"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
+        return self._request_url(method, f"{self.base_url}/{endpoint}", data=data, params=params)
+    
+    def _request_url(
+        self,
+        method: str,
+        url: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        body: Optional[bytes] = None
+    ) -> Dict:
+        """Make HTTP request to a fully formed WhatsApp API URL (body: pre-serialized JSON)"""
+        if params:
+            url = f"{url}?{urlencode(params)}"
         
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=headers,
-            json=data,
-            params=params,
-            timeout=30  # 30 seconds timeout
+        response = self._http.request(
+            method,
+            url,
+            body=body if body is not None else _json_body(data),
+            headers=self._headers_json
         )
         
-        response.raise_for_status()
-        return response.json()
+        return self._parse_response(response)
     
     def send_text_message(self, to: str, text: str, preview_url: bool = False) -> Dict:
         """
@@ -68,22 +337,9 @@ class WhatsAppCloudAPI:
         Returns:
             API response
         """
-        data = {
-            "messaging_product": "whatsapp",
-            "recipient_type": "individual",
-            "to": to,
-            "type": "text",
-            "text": {
-                "preview_url": preview_url,
-                "body": text
-            }
-        }
+        data = _text_message_payload(to, text, preview_url)
         
-        return self._make_request(
-            "POST",
-            f"{self.phone_number_id}/messages",
-            data=data
-        )
+        return self._request_url("POST", self._messages_url, data=data)
     
     def send_flow_message(
         self,
@@ -114,44 +370,19 @@ class WhatsAppCloudAPI:
         Returns:
             API response
         """
-        action_payload = flow_action_payload or {"screen": screen}
-        
-        data = {
-            "messaging_product": "whatsapp",
-            "recipient_type": "individual",
-            "to": to,
-            "type": "interactive",
-            "interactive": {
-                "type": "flow",
-                "header": {
-                    "type": "text",
-                    "text": header_text
-                },
-                "body": {
-                    "text": body_text
-                },
-                "footer": {
-                    "text": footer_text
-                },
-                "action": {
-                    "name": "flow",
-                    "parameters": {
-                        "flow_message_version": "3",
-                        "flow_token": flow_token,
-                        "flow_id": flow_id,
-                        "flow_cta": cta_text,
-                        "flow_action": "navigate",
-                        "flow_action_payload": action_payload
-                    }
-                }
-            }
-        }
-        
-        return self._make_request(
-            "POST",
-            f"{self.phone_number_id}/messages",
-            data=data
+        data = _flow_message_payload(
+            to,
+            flow_id,
+            flow_token,
+            header_text,
+            body_text,
+            footer_text,
+            cta_text,
+            screen,
+            flow_action_payload
         )
+        
+        return self._request_url("POST", self._messages_url, data=data)
     
     def send_template_message(
         self,
@@ -187,42 +418,166 @@ class WhatsAppCloudAPI:
         if components:
             data["template"]["components"] = components
         
-        return self._make_request(
-            "POST",
-            f"{self.phone_number_id}/messages",
-            data=data
-        )
+        return self._request_url("POST", self._messages_url, data=data)
     
     def mark_message_as_read(self, message_id: str) -> Dict:
         """Mark a message as read"""
-        data = {
-            "messaging_product": "whatsapp",
-            "status": "read",
-            "message_id": message_id
-        }
+        return self._request_url("POST", self._messages_url, body=_read_receipt_body(message_id))
+    
+    def get_media(self, media_id: str) -> Dict:
+        """Get media URL (cached for CACHE_TTL_SECONDS)"""
+        return self._cached_get(("media", media_id), media_id)
+    
+    def download_media(self, media_url: str, output_path: str):
+        """Download media file"""
+        response = self._http.request(
+            "GET",
+            media_url,
+            headers=self._headers_auth,
+            preload_content=False,
+            timeout=urllib3.Timeout(connect=5, read=60)
+        )
+        
+        try:
+            if response.status >= 400:
+                raise GraphAPIError(response.status, f"Media download failed with status {response.status}")
+            
+            with open(output_path, 'wb') as f:
+                shutil.copyfileobj(response, f, length=1024 * 1024)
+        finally:
+            response.release_conn()
+
+
+class AsyncWhatsAppCloudAPI(_CloudAPIConfig):
+    """
+    Async WhatsApp Cloud API Client
+    
+    Requests share one multiplexed HTTP/2 connection, so sending many
+    messages concurrently is bounded by throughput rather than round trips.
+    """
+    
+    def __init__(
+        self,
+        access_token: Optional[str] = None,
+        phone_number_id: Optional[str] = None,
+        api_version: str = "v21.0"
+    ):
+        if httpx is None:
+            raise ImportError("httpx is required for AsyncWhatsAppCloudAPI. Run: pip install 'httpx[http2]'")
+        
+        self._configure(access_token, phone_number_id, api_version)
+        self._messages_path = f"/{self.phone_number_id}/messages"
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=True,
+            headers={
+                "Authorization": self._auth_header,
+                "Content-Type": "application/json"
+            },
+            timeout=30,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+    
+    async def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None
+    ) -> Dict:
+        """Make HTTP request to WhatsApp API"""
+        return await self._request_path(method, f"/{endpoint}", data=data, params=params)
+    
+    async def _request_path(
+        self,
+        method: str,
+        path: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        body: Optional[bytes] = None
+    ) -> Dict:
+        """Make HTTP request to a WhatsApp API path relative to base_url (body: pre-serialized JSON)"""
+        content = body if body is not None else _json_body(data)
+        response = await self._client.request(method, path, content=content, params=params)
+        return _parse_graph_response(response.status_code, response.content)
+    
+    async def send_text_message(self, to: str, text: str, preview_url: bool = False) -> Dict:
+        """Send a text message, see WhatsAppCloudAPI.send_text_message"""
+        return await self._request_path(
+            "POST",
+            self._messages_path,
+            data=_text_message_payload(to, text, preview_url)
+        )
+    
+    async def send_flow_message(
+        self,
+        to: str,
+        flow_id: str,
+        flow_token: str,
+        header_text: str = "Start Flow",
+        body_text: str = "Click the button below to start",
+        footer_text: str = "",
+        cta_text: str = "Open",
+        screen: str = "APPOINTMENT",
+        flow_action_payload: Optional[Dict] = None
+    ) -> Dict:
+        """Send a Flow message, see WhatsAppCloudAPI.send_flow_message"""
+        data = _flow_message_payload(
+            to,
+            flow_id,
+            flow_token,
+            header_text,
+            body_text,
+            footer_text,
+            cta_text,
+            screen,
+            flow_action_payload
+        )
         
-        return self._make_request(
+        return await self._request_path(
             "POST",
-            f"{self.phone_number_id}/messages",
+            self._messages_path,
             data=data
         )
     
-    def get_media(self, media_id: str) -> Dict:
-        """Get media URL"""
-        return self._make_request("GET", media_id)
+    async def mark_message_as_read(self, message_id: str) -> Dict:
+        """Mark a message as read"""
+        return await self._request_path(
+            "POST",
+            self._messages_path,
+            body=_read_receipt_body(message_id)
+        )
     
-    def download_media(self, media_url: str, output_path: str):
-        """Download media file"""
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        response = requests.get(media_url, headers=headers, stream=True, timeout=60)
-        response.raise_for_status()
+    async def send_many(self, messages: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Send several /messages payloads concurrently
         
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        Args:
+            messages: Message payloads, e.g. {"messaging_product": "whatsapp", "to": ..., "type": "text", ...}
+        
+        Returns:
+            API responses in the same order; failed sends are returned as exceptions
+        """
+        return await asyncio.gather(
+            *(
+                self._request_path("POST", self._messages_path, data=message)
+                for message in messages
+            ),
+            return_exceptions=True
+        )
+    
+    async def aclose(self):
+        """Close pooled connections"""
+        await self._client.aclose()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
 
 
-class WhatsAppFlowsAPI:
+class WhatsAppFlowsAPI(_GraphAPIClient):
     """WhatsApp Flows API Client"""
     
     def __init__(
@@ -231,6 +586,8 @@ class WhatsAppFlowsAPI:
         waba_id: Optional[str] = None,
         api_version: str = "v21.0"
     ):
+        _ensure_env_loaded()
+        
         self.access_token = access_token or os.getenv("WHATSAPP_ACCESS_TOKEN")
         self.waba_id = waba_id or os.getenv("WHATSAPP_WABA_ID")
         self.api_version = api_version or os.getenv("WHATSAPP_API_VERSION", "v21.0")
@@ -240,6 +597,10 @@ class WhatsAppFlowsAPI:
             raise ValueError("Access token is required")
         if not self.waba_id:
             raise ValueError("WABA ID is required")
+        
+        self._auth_header = f"Bearer {self.access_token}"
+        self._init_http()
+        self._cache = _TTLCache()
     
     def _make_request(
         self,
@@ -250,16 +611,24 @@ class WhatsAppFlowsAPI:
     ) -> Dict:
         """Make HTTP request to WhatsApp API"""
         url = f"{self.base_url}/{endpoint}"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
         
         if files:
-            response = requests.request(method=method, url=url, headers=headers, data=data, files=files, timeout=30)
+            # urllib3 encodes the multipart body and sets its Content-Type
+            response = self._http.request(
+                method,
+                url,
+                headers=self._headers_auth,
+                fields={**(data or {}), **files}
+            )
         else:
-            headers["Content-Type"] = "application/json"
-            response = requests.request(method=method, url=url, headers=headers, json=data, timeout=30)
+            response = self._http.request(
+                method,
+                url,
+                body=_json_body(data),
+                headers=self._headers_json
+            )
         
-        response.raise_for_status()
-        return response.json()
+        return self._parse_response(response)
     
     def create_flow(
         self,
@@ -289,21 +658,27 @@ class WhatsAppFlowsAPI:
         return self._make_request("POST", f"{self.waba_id}/flows", data=data)
     
     def get_flow(self, flow_id: str, fields: Optional[str] = None) -> Dict:
-        """Get Flow details"""
+        """Get Flow details (cached for CACHE_TTL_SECONDS)"""
         params = {"fields": fields} if fields else None
-        return self._make_request("GET", flow_id, data=params)
+        return self._cached_get(("flow", flow_id, fields), flow_id, data=params)
     
     def update_flow(self, flow_id: str, **kwargs) -> Dict:
         """Update Flow metadata"""
-        return self._make_request("POST", flow_id, data=kwargs)
+        response = self._make_request("POST", flow_id, data=kwargs)
+        self.invalidate(flow_id)
+        return response
     
     def delete_flow(self, flow_id: str) -> Dict:
         """Delete a Flow"""
-        return self._make_request("DELETE", flow_id)
+        response = self._make_request("DELETE", flow_id)
+        self.invalidate(flow_id)
+        return response
     
     def publish_flow(self, flow_id: str) -> Dict:
         """Publish a Flow"""
-        return self._make_request("POST", f"{flow_id}/publish")
+        response = self._make_request("POST", f"{flow_id}/publish")
+        self.invalidate(flow_id)
+        return response
     
     def upload_flow_json(self, flow_id: str, flow_json_path: str) -> Dict:
         """
@@ -316,24 +691,46 @@ class WhatsAppFlowsAPI:
         Returns:
             Upload response
         """
-        with open(flow_json_path, 'rb') as f:
-            files = {'file': ('flow.json', f, 'application/json')}
-            return self._make_request("POST", f"{flow_id}/assets", files=files)
+        # Map the file so its pages come straight from the page cache
+        with open(flow_json_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            files = {'file': ('flow.json', mm, 'application/json')}
+            response = self._make_request("POST", f"{flow_id}/assets", files=files)
+        
+        self.invalidate(flow_id)
+        return response
     
     def deprecate_flow(self, flow_id: str) -> Dict:
         """Deprecate a Flow"""
-        return self._make_request("POST", f"{flow_id}/deprecate")
+        response = self._make_request("POST", f"{flow_id}/deprecate")
+        self.invalidate(flow_id)
+        return response
     
     def get_flow_assets(self, flow_id: str) -> Dict:
-        """Get Flow assets"""
-        return self._make_request("GET", f"{flow_id}/assets")
+        """Get Flow assets (cached for CACHE_TTL_SECONDS)"""
+        return self._cached_get(("assets", flow_id), f"{flow_id}/assets")
+    
+    def invalidate(self, flow_id: str):
+        """Drop cached reads for a Flow after it changes"""
+        self._cache.invalidate(flow_id)
+
+
+@lru_cache(maxsize=1)
+def get_cloud_api() -> WhatsAppCloudAPI:
+    """Shared WhatsAppCloudAPI configured from the environment"""
+    return WhatsAppCloudAPI()
+
+
+@lru_cache(maxsize=1)
+def get_flows_api() -> WhatsAppFlowsAPI:
+    """Shared WhatsAppFlowsAPI configured from the environment"""
+    return WhatsAppFlowsAPI()
 
 
 # Example usage
 if __name__ == "__main__":
     # Initialize API client
-    api = WhatsAppCloudAPI()
-    flows_api = WhatsAppFlowsAPI()
+    api = get_cloud_api()
+    flows_api = get_flows_api()
     
     # Example: Send text message
     # response = api.send_text_message(